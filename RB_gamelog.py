@@ -2,38 +2,36 @@
 RB_gamelog.py
 
 Scrapes ESPN team roster pages to find Running Backs (RB) for each NFL team.
-Saves results to `data/rb_player_ids.csv`.
+Saves results to `data/rb_player_ids.csv` (and `.parquet`).
 
 Usage:
-    pip install requests beautifulsoup4 pandas
+    pip install requests requests-cache aiohttp "aiohttp-client-cache[sqlite]" aiolimiter orjson selectolax pyarrow
     python RB_gamelog.py
 
 Notes:
-- Uses `requests` + `BeautifulSoup`.
-- Rate-limits requests with `time.sleep` to avoid hitting ESPN too hard.
+- Roster pages are fetched together with the depth charts by
+  `team_rb_snapshot.py`; this script writes the roster RBs from
+  `data/team_rb_snapshot.parquet`, running that scrape first if the snapshot
+  is missing or stale. `scrape_all_teams` scrapes a subset of teams.
+- Pages are parsed with `selectolax`.
 - Skips a team if any error occurs while fetching/parsing.
 """
 
 import os
 import re
-import time
-import random
+import asyncio
 import logging
-from typing import List, Dict
+from typing import List, Dict, Optional
 
 import requests
-from bs4 import BeautifulSoup
-import pandas as pd
+from selectolax.lexbor import LexborHTMLParser
+
+from scrape_utils import HEADERS, make_session, save_rows
 
 # Basic logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s: %(message)s')
 logger = logging.getLogger(__name__)
 
-# ESPN user-agent
-HEADERS = {
-    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-}
-
 # ESPN team abbreviations (used in roster URLs). These are the values ESPN uses in URLs, lowercase.
 TEAM_ABBREVS = [
     'nyg','cin','buf','mia','chi','wsh','atl','ten','min','nyj','car','dal',
@@ -47,117 +45,156 @@ ROSTER_URL = 'https://www.espn.com/nfl/team/roster/_/name/{team_abbrev}'
 # Output path
 OUTPUT_DIR = 'data'
 OUTPUT_CSV = os.path.join(OUTPUT_DIR, 'rb_player_ids.csv')
+OUTPUT_PARQUET = os.path.join(OUTPUT_DIR, 'rb_player_ids.parquet')
+OUTPUT_COLUMNS = ['team', 'player_name', 'player_id']
 
 # Regex to find ESPN player id in player profile URLs
 PLAYER_ID_RE = re.compile(r'/player/_/id/(\d+)')
 
-# Rate limiting settings
-MIN_SLEEP = 1.0
-MAX_SLEEP = 2.0
+# Player profile links inside a roster row
+PLAYER_LINK_SELECTOR = 'a[href*="/player/_/id/"]'
+
+# Header text of the roster tables' position column
+POS_HEADER = 'POS'
+
+# Regex to spot an 'RB' position code in a roster cell
+RB_RE = re.compile(r'\bRB\b', re.IGNORECASE)
+
+# Regex for a short (<= 3 char) leading token, e.g. 'QB', used as fallback position
+POS_FALLBACK_RE = re.compile(r'\S{1,3}(?!\S)')
+
+# Roster pages carry a large footer and inline scripts after the roster tables;
+# everything past the last closing table tag is dropped before parsing.
+TABLE_END = b'</table>'
 
 
 def fetch_team_roster(team_abbrev: str, session: requests.Session = None) -> List[Dict]:
-    """Fetch roster page for a team and extract RBs.
+    """Fetch roster page for a single team and extract RBs.
 
+    Synchronous helper, handy for debugging one team at a time.
     Returns a list of dicts with keys: team (abbrev), player_name, player_id
     """
-    session = session or requests.Session()
+    session = session or make_session()
     url = ROSTER_URL.format(team_abbrev=team_abbrev)
 
     logger.info('Fetching roster for %s: %s', team_abbrev, url)
     resp = session.get(url, headers=HEADERS, timeout=10)
     resp.raise_for_status()
 
-    soup = BeautifulSoup(resp.content, 'html.parser')
+    return parse_roster_html(resp.content, team_abbrev)
 
-    results = []
-    seen_ids = set()
 
-    # Strategy: Find all links to player profiles, then for each link try to find
-    # the position from the parent row (<tr>) or nearby cells. Include player
-    # when position contains 'RB'.
-    for a in soup.find_all('a', href=re.compile(r'/player/_/id/\d+')):
-        href = a.get('href', '')
-        match = PLAYER_ID_RE.search(href)
-        if not match:
-            continue
-        player_id = match.group(1)
-        player_name = a.get_text(strip=True)
-        if not player_name:
-            continue
+def trim_after_tables(html: bytes) -> bytes:
+    """Return `html` cut off right after its last </table> (unchanged if none)."""
+    end = html.rfind(TABLE_END)
+    if end == -1:
+        return html
+    return html[:end + len(TABLE_END)]
 
-        # Avoid duplicates
-        if player_id in seen_ids:
-            continue
 
-        # Try to determine position text from parent <tr> if present
-        position_text = ''
-        parent_tr = a.find_parent('tr')
-
-        if parent_tr:
-            # Collect text from all <td> in row (positions are often in a column)
-            tds = parent_tr.find_all('td')
-            for td in tds:
-                text = td.get_text(separator=' ', strip=True)
-                if text:
-                    # Check if this td looks like a position cell (single short code)
-                    # Many ESPN roster tables put position in a cell like 'RB', 'WR', etc.
-                    if re.search(r'\bRB\b', text, flags=re.IGNORECASE):
-                        position_text = text
-                        break
-                    # Otherwise keep the last short token as fallback
-                    # (but only if it's short)
-                    tokens = text.split()
-                    if tokens and len(tokens[0]) <= 3:
-                        position_text = tokens[0]
-        else:
-            # If no parent <tr>, try sibling elements
-            sib = a.find_next_sibling()
-            if sib:
-                position_text = sib.get_text(strip=True)
-
-        # Normalize and check for RB
-        if position_text:
-            pos_norm = position_text.upper()
-        else:
-            pos_norm = ''
-
-        # Only include players whose position contains 'RB'
-        if 'RB' in pos_norm:
+def parse_roster_html(html: bytes, team_abbrev: str) -> List[Dict]:
+    """Parse a roster page and extract RBs.
+
+    Only the part of the page up to the last roster table is parsed; if that
+    yields no RBs the full page is parsed instead.
+    Returns a list of dicts with keys: team (abbrev), player_name, player_id
+    """
+    trimmed = trim_after_tables(html)
+    results = parse_roster_tables(trimmed, team_abbrev)
+    if not results and len(trimmed) < len(html):
+        logger.debug('No RBs in trimmed roster page for %s; parsing full page', team_abbrev)
+        results = parse_roster_tables(html, team_abbrev)
+    return results
+
+
+def parse_roster_tables(html: bytes, team_abbrev: str) -> List[Dict]:
+    """Extract the RBs from every roster table in `html` (see `parse_roster_html`)."""
+    tree = LexborHTMLParser(html)
+
+    results = []
+    seen_ids = set()
+
+    # One top-down pass per roster table (Offense / Defense / Special Teams):
+    # find the POS column from the header once, then check each row's position
+    # cell and only look for the player link in RB rows.
+    for table in tree.css('table'):
+        pos_idx = position_column([th.text(strip=True) for th in table.css('thead th')])
+
+        for tr in table.css('tr'):
+            cells = tr.css('td')
+            if not cells:
+                continue
+
+            if pos_idx is not None and pos_idx < len(cells):
+                position_text = cells[pos_idx].text(strip=True)
+            else:
+                # No usable header: guess the position from the row's cells
+                position_text = position_from_cells([td.text(separator=' ', strip=True) for td in cells])
+
+            # Only include players whose position contains 'RB'
+            if 'RB' not in position_text.upper():
+                continue
+
+            # The headshot link comes first and has no text; use the name link
+            for a in tr.css(PLAYER_LINK_SELECTOR):
+                match = PLAYER_ID_RE.search(a.attributes.get('href') or '')
+                player_name = a.text(strip=True)
+                if match and player_name:
+                    break
+            else:
+                continue
+
+            player_id = match.group(1)
+            # Avoid duplicates
+            if player_id in seen_ids:
+                continue
             results.append({'team': team_abbrev, 'player_name': player_name, 'player_id': player_id})
             seen_ids.add(player_id)
 
     return results
 
 
-def scrape_all_teams(team_abbrevs: List[str] = None, sleep_range=(MIN_SLEEP, MAX_SLEEP)) -> pd.DataFrame:
-    """Scrape all teams and return DataFrame of RBs.
+def position_column(headers: List[str]) -> Optional[int]:
+    """Return the index of the POS column given a table's header texts, or None."""
+    for idx, text in enumerate(headers):
+        if text.upper() == POS_HEADER:
+            return idx
+    return None
 
-    - team_abbrevs: optional list to limit teams (useful for testing)
-    - sleep_range: tuple(min,max) seconds to sleep between requests
-    """
-    team_abbrevs = team_abbrevs or TEAM_ABBREVS
-    session = requests.Session()
 
-    all_rows = []
+def position_from_cells(tds_text: List[str]) -> str:
+    """Guess the position from the text of a roster row's <td> cells.
 
-    for team in team_abbrevs:
-        try:
-            team_rows = fetch_team_roster(team, session=session)
-            logger.info('Found %d RBs for %s', len(team_rows), team)
-            all_rows.extend(team_rows)
-        except requests.exceptions.RequestException as e:
-            logger.error('Network error for %s: %s', team, e)
-        except Exception as e:
-            logger.exception('Error parsing roster for %s: %s', team, e)
-
-        # Rate limiting
-        sleep_for = random.uniform(*sleep_range)
-        logger.debug('Sleeping %.2fs', sleep_for)
-        time.sleep(sleep_for)
+    Used for tables without a POS header column.
+    """
+    position_text = ''
+    for text in tds_text:
+        if not text:
+            continue
+        # Check if this td looks like a position cell (single short code)
+        # Many ESPN roster tables put position in a cell like 'RB', 'WR', etc.
+        if RB_RE.search(text):
+            return text
+        # Otherwise keep the last short leading token as fallback
+        match = POS_FALLBACK_RE.match(text)
+        if match:
+            position_text = match.group()
+    return position_text
+
+
+async def scrape_all_teams(team_abbrevs: List[str] = None, scrape=None) -> List[Dict]:
+    """Scrape all teams and return a list of RB rows (see `OUTPUT_COLUMNS`).
+
+    Wrapper over `team_rb_snapshot.scrape_snapshot`, which fetches each team's
+    roster page together with its depth chart.
+    - team_abbrevs: optional list to limit teams (useful for testing)
+    - scrape: optional shared scraper from `scrape_utils.open_scraper()`
+    """
+    # Imported here because team_rb_snapshot imports this module
+    import team_rb_snapshot
 
-    df = pd.DataFrame(all_rows, columns=['team', 'player_name', 'player_id'])
-    return df
+    rows = await team_rb_snapshot.scrape_snapshot(team_abbrevs, scrape)
+    return team_rb_snapshot.select_rows(rows, team_rb_snapshot.ROSTER_RANK, OUTPUT_COLUMNS)
 
 
 def ensure_output_dir():
@@ -165,18 +202,27 @@ def ensure_output_dir():
         os.makedirs(OUTPUT_DIR, exist_ok=True)
 
 
-if __name__ == '__main__':
-    # WARNING: This will make requests to ESPN for each team. Use responsibly.
-    logger.info('Starting RB scraper for %d teams', len(TEAM_ABBREVS))
+async def main_async():
+    """Main entry point.
+
+    Writes the roster RBs from the team RB snapshot (`team_rb_snapshot.py`,
+    re-scraped if missing or stale) to `OUTPUT_CSV` / `OUTPUT_PARQUET`.
+    """
+    # Imported here because team_rb_snapshot imports this module
+    import team_rb_snapshot
 
     # To avoid hitting ESPN too hard during development, you can pass a small
     # subset to `scrape_all_teams(['nyg','cin'])`.
 
-    df = scrape_all_teams()
-
-    if df.empty:
+    rows = await team_rb_snapshot.load_or_scrape(team_rb_snapshot.ROSTER_RANK, OUTPUT_COLUMNS)
+    if not rows:
         logger.warning('No RBs found; exiting without writing CSV')
-    else:
-        ensure_output_dir()
-        df.to_csv(OUTPUT_CSV, index=False)
-        logger.info('Saved %d RB rows to %s', len(df), OUTPUT_CSV)
+        return
+
+    ensure_output_dir()
+    save_rows(rows, OUTPUT_COLUMNS, OUTPUT_CSV, OUTPUT_PARQUET)
+    logger.info('Saved %d RB rows to %s and %s', len(rows), OUTPUT_CSV, OUTPUT_PARQUET)
+
+
+if __name__ == '__main__':
+    asyncio.run(main_async())
@@ -4,12 +4,19 @@ compare_rb_vs_defenses.py
 Analyzes RB performance against top 16 (best) and bottom 16 (worst) run defenses.
 Defense rankings are based on rushing yards allowed (lower = better defense).
 
+Inputs are read from Parquet when available (faster, typed), else CSV.
+Results are written as both CSV and Parquet.
+
 Usage:
+    pip install numpy pandas pyarrow
     python compare_rb_vs_defenses.py
 """
 
+import os
 import logging
+import numpy as np
 import pandas as pd
+from pandas.api.types import CategoricalDtype, is_numeric_dtype
 
 # Logging setup
 logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s: %(message)s')
@@ -57,6 +64,33 @@ TEAM_NAME_TO_ABBREV = {
     'Jacksonville Jaguars': 'jax',
 }
 
+# Fixed 32-team code set for team / opponent columns
+TEAM_DTYPE = CategoricalDtype(categories=list(TEAM_NAME_TO_ABBREV.values()))
+
+# Per-game stat columns summed for each RB
+STAT_COLUMNS = [
+    'rushing_yards',
+    'rushing_attempts',
+    'rushing_td',
+    'receiving_yards',
+    'receiving_receptions',
+]
+
+
+def to_parquet_path(csv_path):
+    """Return the Parquet path that sits next to `csv_path`."""
+    return os.path.splitext(csv_path)[0] + '.parquet'
+
+
+def read_table(csv_path):
+    """Read the Parquet twin of `csv_path` if it exists, otherwise the CSV."""
+    parquet_path = to_parquet_path(csv_path)
+    if os.path.exists(parquet_path):
+        logger.info('Loading %s', parquet_path)
+        return pd.read_parquet(parquet_path)
+    logger.info('Loading %s', csv_path)
+    return pd.read_csv(csv_path)
+
 
 def load_defense_rankings():
     """
@@ -64,14 +98,13 @@ def load_defense_rankings():
     Lower yards allowed = better defense.
     Returns top 16 (best defenses) and bottom 16 (worst defenses) as team abbreviations.
     """
-    logger.info('Loading defense stats from %s', DEFENSE_STATS)
-    df_def = pd.read_csv(DEFENSE_STATS)
+    df_def = read_table(DEFENSE_STATS)
     
     logger.info('Defense stats shape: %s', df_def.shape)
     logger.info('Columns: %s', df_def.columns.tolist())
     
-    # Convert rushing yards to numeric (remove commas)
-    if 'Rushing Yards (Yds)' in df_def.columns:
+    # Convert rushing yards to numeric (remove commas); Parquet is already numeric
+    if 'Rushing Yards (Yds)' in df_def.columns and not is_numeric_dtype(df_def['Rushing Yards (Yds)']):
         df_def['Rushing Yards (Yds)'] = df_def['Rushing Yards (Yds)'].str.replace(',', '').astype(int)
     
     # Sort by rushing yards allowed (ascending = best defense)
@@ -93,100 +126,86 @@ def load_defense_rankings():
 
 
 def load_rb_gamelogs():
-    """Load RB game logs."""
-    logger.info('Loading RB game logs from %s', RB_GAMELOG)
-    df = pd.read_csv(RB_GAMELOG)
+    """Load RB game logs (team and player_name as categoricals)."""
+    df = read_table(RB_GAMELOG)
+    df['team'] = df['team'].astype(TEAM_DTYPE)
+    df['player_name'] = df['player_name'].astype('category')
     return df
 
 
-def normalize_opponent_abbrev(opp_string):
-    """Extract team abbreviation from opponent string like '@SEA' or 'vsKC'."""
-    if not opp_string or not isinstance(opp_string, str):
-        return None
+def normalize_opponent_abbrev(opponents):
+    """Extract team abbreviations from opponent strings like '@SEA' or 'vsKC'.
+
+    Works on a whole Series at once; unparseable entries become <NA>.
+    """
+    opp = opponents.astype('string')
     
     # Remove @ or vs prefix
-    opp = opp_string.replace('@', '').replace('vs', '').lower().strip()
+    opp = opp.str.replace('@', '', regex=False).str.replace('vs', '', regex=False).str.lower().str.strip()
     
     # Handle full names or extra text
-    if len(opp) > 3:
-        return None
-    
-    return opp
+    return opp.where(opp.str.len().le(3), other=pd.NA)
+
+
+def summarize_vs_defenses(games, defenses, player_teams, label):
+    """Sum each RB's stats over games against `defenses`.
+
+    `label` is the column suffix ('top16' or 'bottom16'). `player_teams` maps
+    player_name category codes to team. Returns one row per RB.
+    """
+    # Compare integer category codes rather than hashing strings per row
+    codes = pd.Categorical(defenses, dtype=TEAM_DTYPE).codes
+    games_vs = games[games['opponent_abbrev'].cat.codes.isin(codes)]
+
+    aggregations = {f'games_vs_{label}': ('opponent_abbrev', 'size')}
+    for col in STAT_COLUMNS:
+        aggregations[f'{col}_vs_{label}'] = (col, 'sum')
+    # Group on the player category codes; names are looked up once at the end
+    stats = games_vs.groupby(games_vs['player_name'].cat.codes.to_numpy(), sort=False).agg(**aggregations)
+    player_codes = stats.index.to_numpy()
+
+    # Build the output column by column from NumPy arrays
+    columns = {
+        'player_name': games_vs['player_name'].cat.categories.take(player_codes),
+        'team': player_teams.reindex(player_codes).array,
+    }
+    for col in stats.columns:
+        columns[col] = stats[col].to_numpy()
+
+    # Calculate averages (only where the RB had rushing attempts)
+    yards = columns[f'rushing_yards_vs_{label}']
+    attempts = columns[f'rushing_attempts_vs_{label}']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        columns[f'rushing_avg_vs_{label}'] = np.where(attempts > 0, np.round(yards / attempts, 2), np.nan)
+
+    return pd.DataFrame(columns)
 
 
 def analyze_rb_vs_defenses(df_games, top16_defenses, bottom16_defenses):
-    """Analyze RB performance against top 16 and bottom 16 defenses."""
+    """Analyze RB performance against top 16 and bottom 16 defenses.
+
+    `df_games` is any game log DataFrame; team and player_name are made
+    categorical here (a no-op if `load_rb_gamelogs` already did it).
+    """
     logger.info('Analyzing RB performance...')
-    
-    results_top = []
-    results_bottom = []
-    
-    # For each unique RB
-    for player_name in df_games['player_name'].unique():
-        player_games = df_games[df_games['player_name'] == player_name].copy()
-        
-        # Extract opponent abbreviations
-        player_games['opponent_abbrev'] = player_games['opponent'].apply(normalize_opponent_abbrev)
-        
-        # Remove rows where opponent couldn't be parsed
-        player_games = player_games[player_games['opponent_abbrev'].notna()]
-        
-        # Games vs top defenses
-        games_vs_top = player_games[player_games['opponent_abbrev'].isin(top16_defenses)]
-        
-        # Games vs bottom defenses
-        games_vs_bottom = player_games[player_games['opponent_abbrev'].isin(bottom16_defenses)]
-        
-        # Get team abbreviation
-        team_abbrev = player_games['team'].iloc[0] if len(player_games) > 0 else None
-        
-        if len(games_vs_top) > 0:
-            # Remove NaN values before summing
-            rushing_yards_sum = games_vs_top['rushing_yards'].sum()
-            rushing_attempts_sum = games_vs_top['rushing_attempts'].sum()
-            rushing_td_sum = games_vs_top['rushing_td'].sum()
-            receiving_yards_sum = games_vs_top['receiving_yards'].sum()
-            receiving_recs_sum = games_vs_top['receiving_receptions'].sum()
-            
-            stats_top = {
-                'player_name': player_name,
-                'team': team_abbrev,
-                'games_vs_top16': len(games_vs_top),
-                'rushing_yards_vs_top16': rushing_yards_sum,
-                'rushing_attempts_vs_top16': rushing_attempts_sum,
-                'rushing_td_vs_top16': rushing_td_sum,
-                'receiving_yards_vs_top16': receiving_yards_sum,
-                'receiving_receptions_vs_top16': receiving_recs_sum,
-            }
-            # Calculate averages
-            if stats_top['rushing_attempts_vs_top16'] > 0:
-                stats_top['rushing_avg_vs_top16'] = round(stats_top['rushing_yards_vs_top16'] / stats_top['rushing_attempts_vs_top16'], 2)
-            results_top.append(stats_top)
-        
-        if len(games_vs_bottom) > 0:
-            # Remove NaN values before summing
-            rushing_yards_sum = games_vs_bottom['rushing_yards'].sum()
-            rushing_attempts_sum = games_vs_bottom['rushing_attempts'].sum()
-            rushing_td_sum = games_vs_bottom['rushing_td'].sum()
-            receiving_yards_sum = games_vs_bottom['receiving_yards'].sum()
-            receiving_recs_sum = games_vs_bottom['receiving_receptions'].sum()
-            
-            stats_bottom = {
-                'player_name': player_name,
-                'team': team_abbrev,
-                'games_vs_bottom16': len(games_vs_bottom),
-                'rushing_yards_vs_bottom16': rushing_yards_sum,
-                'rushing_attempts_vs_bottom16': rushing_attempts_sum,
-                'rushing_td_vs_bottom16': rushing_td_sum,
-                'receiving_yards_vs_bottom16': receiving_yards_sum,
-                'receiving_receptions_vs_bottom16': receiving_recs_sum,
-            }
-            # Calculate averages
-            if stats_bottom['rushing_attempts_vs_bottom16'] > 0:
-                stats_bottom['rushing_avg_vs_bottom16'] = round(stats_bottom['rushing_yards_vs_bottom16'] / stats_bottom['rushing_attempts_vs_bottom16'], 2)
-            results_bottom.append(stats_bottom)
-    
-    return pd.DataFrame(results_top), pd.DataFrame(results_bottom)
+
+    # Extract opponent abbreviations for every game at once ('@SEA' -> 'sea')
+    opp = normalize_opponent_abbrev(df_games['opponent'])
+    games = df_games.assign(
+        team=df_games['team'].astype(TEAM_DTYPE),
+        player_name=df_games['player_name'].astype('category'),
+        opponent_abbrev=opp.astype(TEAM_DTYPE),
+    )
+
+    # Remove rows where opponent couldn't be parsed
+    games = games[games['opponent_abbrev'].notna()]
+
+    # Team abbreviation for each RB (from their first parsed game), keyed by player code
+    player_teams = games.groupby(games['player_name'].cat.codes.to_numpy(), sort=False)['team'].first()
+
+    df_top = summarize_vs_defenses(games, top16_defenses, player_teams, 'top16')
+    df_bottom = summarize_vs_defenses(games, bottom16_defenses, player_teams, 'bottom16')
+    return df_top, df_bottom
 
 
 def main():
@@ -204,12 +223,14 @@ def main():
     if len(df_top) > 0:
         df_top = df_top.sort_values('rushing_yards_vs_top16', ascending=False)
         df_top.to_csv(OUTPUT_VS_TOP, index=False)
+        df_top.to_parquet(to_parquet_path(OUTPUT_VS_TOP), compression='snappy', index=False)
         logger.info('Saved %d RBs performance vs top 16 defenses to %s', len(df_top), OUTPUT_VS_TOP)
         logger.info('Top RBs vs best defenses:\n%s', df_top.head(10))
     
     if len(df_bottom) > 0:
         df_bottom = df_bottom.sort_values('rushing_yards_vs_bottom16', ascending=False)
         df_bottom.to_csv(OUTPUT_VS_BOTTOM, index=False)
+        df_bottom.to_parquet(to_parquet_path(OUTPUT_VS_BOTTOM), compression='snappy', index=False)
         logger.info('Saved %d RBs performance vs bottom 16 defenses to %s', len(df_bottom), OUTPUT_VS_BOTTOM)
         logger.info('Top RBs vs worst defenses:\n%s', df_bottom.head(10))
 
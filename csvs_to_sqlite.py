@@ -2,32 +2,58 @@
 csvs_to_sqlite.py
 
 Load specified CSV files into a SQLite database. Each CSV becomes its own table.
-Table names use the CSV filename without the `.csv` extension.
+Table names use the CSV filename without the `.csv` extension. Entries may also
+be `.parquet` files, and a CSV's `.parquet` twin is preferred when it exists.
+
+If `scrape_all.py` has written `data/scrape_bundle.parquet/`, each of its
+partitions is loaded first, and CSV entries for tables already loaded from the
+bundle are skipped. A partition is passed over when its CSV_FILES entry is
+newer (e.g. `defenses.py` was re-run after `scrape_all.py`), so the fresher
+file wins.
 
 Usage:
+    pip install pyarrow adbc-driver-sqlite
     python csvs_to_sqlite.py
 
 The script will create `data/rb_analysis.db` and add tables:
  - rb_vs_top
  - rb_bottom
  - defense_stats
+ - rb_player_ids, starting_rbs (from the scrape bundle, when present)
+
+Files are read straight into Arrow tables (CSVs with Arrow's multithreaded
+reader) and ingested via ADBC, without going through pandas. All tables are
+written in a single transaction.
 
 """
 import os
-import sqlite3
 import logging
-import pandas as pd
+
+import adbc_driver_sqlite.dbapi
+import pyarrow as pa
+import pyarrow.csv
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s: %(message)s')
 logger = logging.getLogger(__name__)
 
 DB_PATH = 'data/rb_analysis.db'
+BUNDLE_PATH = 'data/scrape_bundle.parquet'
 CSV_FILES = [
     'data/rb_vs_top.csv',
     'data/rb_bottom.csv',
     'defense_stats.csv',
 ]
 
+# Connection tuning applied before loading
+SQLITE_PRAGMAS = [
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA cache_size=-65536',
+]
+
 
 def csv_to_table_name(path: str) -> str:
     base = os.path.basename(path)
@@ -38,6 +64,54 @@ def csv_to_table_name(path: str) -> str:
     return tbl
 
 
+def normalize_column_name(col: str) -> str:
+    """Make a column name SQL-friendly: spaces to underscores, drop '.', '(' and ')'."""
+    return col.strip().replace(' ', '_').replace('.', '').replace('(', '').replace(')', '')
+
+
+def resolve_table_file(path: str) -> str:
+    """Return the `.parquet` twin of a CSV path if it exists, else the path itself."""
+    parquet = os.path.splitext(path)[0] + '.parquet'
+    if os.path.exists(parquet):
+        return parquet
+    return path
+
+
+def read_table_file(path: str) -> pa.Table:
+    """Read a CSV or Parquet file into an Arrow table based on its extension."""
+    if path.endswith('.parquet'):
+        return pq.read_table(path)
+    return pyarrow.csv.read_csv(path)
+
+
+def execute(conn, sql: str) -> None:
+    """Run one statement on a fresh cursor."""
+    with conn.cursor() as cur:
+        cur.execute(sql)
+        cur.fetchall()
+
+
+def ingest_table(conn, table: str, data: pa.Table) -> None:
+    """Create (or replace) `table` from an Arrow table via ADBC.
+
+    The ingest runs inside its own SAVEPOINT, so a failure rolls back just
+    this table (the error is re-raised) and the rest of the transaction
+    survives. Each statement gets a fresh cursor: a cursor whose ingest
+    failed can't run anything else.
+    """
+    data = data.rename_columns([normalize_column_name(c) for c in data.column_names])
+    execute(conn, f'SAVEPOINT "{table}"')
+    try:
+        with conn.cursor() as cur:
+            cur.adbc_ingest(table, data, mode='replace')
+    except Exception:
+        execute(conn, f'ROLLBACK TO "{table}"')
+        raise
+    finally:
+        execute(conn, f'RELEASE "{table}"')
+    logger.info('Wrote %d rows to %s.%s', data.num_rows, DB_PATH, table)
+
+
 def main():
     os.makedirs('data', exist_ok=True)
 
@@ -46,34 +120,92 @@ def main():
         logger.info('Removing existing DB at %s', DB_PATH)
         os.remove(DB_PATH)
 
-    conn = sqlite3.connect(DB_PATH)
+    # Autocommit mode so the PRAGMAs (WAL can't be enabled inside a
+    # transaction) run first; the BEGIN below then covers every table
+    with adbc_driver_sqlite.dbapi.connect(DB_PATH, autocommit=True) as conn:
+        for pragma in SQLITE_PRAGMAS:
+            execute(conn, pragma)
+
+        # One transaction (one fsync) for every table
+        execute(conn, 'BEGIN')
+        bundle_tables = load_bundle(conn, skip=newer_table_files()) if os.path.isdir(BUNDLE_PATH) else set()
+        load_tables(conn, skip=bundle_tables)
+        execute(conn, 'COMMIT')
+
+    logger.info('Database created at %s', DB_PATH)
+
+
+def newest_mtime(path: str) -> float:
+    """Return the latest modification time of `path` or, for a directory, of its files."""
+    if not os.path.isdir(path):
+        return os.path.getmtime(path)
+    return max((os.path.getmtime(os.path.join(path, f)) for f in os.listdir(path)), default=0.0)
+
+
+def newer_table_files() -> set:
+    """Return the tables whose CSV_FILES entry is newer than its bundle partition."""
+    newer = set()
+    for csv in CSV_FILES:
+        path = resolve_table_file(csv)
+        table = csv_to_table_name(path)
+        partition = os.path.join(BUNDLE_PATH, f'table={table}')
+        if os.path.exists(path) and os.path.isdir(partition) and newest_mtime(path) > newest_mtime(partition):
+            newer.add(table)
+    return newer
+
+
+def load_bundle(conn, skip: set = frozenset()) -> set:
+    """Ingest each `table=<name>` partition of the scrape bundle into its own table.
+
+    Tables in `skip` are left for `load_tables`. Returns the set of table
+    names loaded.
+    """
+    loaded = set()
+    for entry in sorted(os.listdir(BUNDLE_PATH)):
+        if not entry.startswith('table='):
+            continue
+        table = entry.split('=', 1)[1]
+        partition = os.path.join(BUNDLE_PATH, entry)
+        if table in skip:
+            logger.info('Skipping %s: a newer file for table `%s` is listed in CSV_FILES', partition, table)
+            continue
+        logger.info('Loading %s into table `%s`', partition, table)
+
+        try:
+            ingest_table(conn, table, ds.dataset(partition, format='parquet').to_table())
+            loaded.add(table)
+        except Exception as e:
+            logger.error('Failed to load bundle table %s: %s', table, e)
+
+    return loaded
 
+
+def load_tables(conn, skip: set = frozenset()) -> None:
+    """Load every file in CSV_FILES into its own table (except tables in `skip`)."""
     for csv in CSV_FILES:
+        csv = resolve_table_file(csv)
         if not os.path.exists(csv):
             logger.warning('CSV file not found, skipping: %s', csv)
             continue
 
         table = csv_to_table_name(csv)
+        if table in skip:
+            logger.info('Table `%s` already loaded from %s, skipping %s', table, BUNDLE_PATH, csv)
+            continue
+
         logger.info('Loading %s into table `%s`', csv, table)
 
         try:
-            df = pd.read_csv(csv)
+            data = read_table_file(csv)
         except Exception as e:
             logger.error('Failed to read %s: %s', csv, e)
             continue
 
-        # Normalize column names: replace spaces with underscores
-        df.columns = [c.strip().replace(' ', '_').replace('.', '').replace('(', '').replace(')', '') for c in df.columns]
-
         try:
-            df.to_sql(table, conn, if_exists='replace', index=False)
-            logger.info('Wrote %d rows to %s.%s', len(df), DB_PATH, table)
+            ingest_table(conn, table, data)
         except Exception as e:
             logger.error('Failed to write table %s: %s', table, e)
 
-    conn.close()
-    logger.info('Database created at %s', DB_PATH)
-
 
 if __name__ == '__main__':
     main()
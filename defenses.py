@@ -1,50 +1,55 @@
 import requests
-from bs4 import BeautifulSoup
 import pandas as pd
-import json
-import re
+
+from scrape_utils import HEADERS, make_session, parse_espnfitt
 
 # URL to scrape
 URL = "https://www.espn.com/nfl/stats/team/_/view/defense/table/rushing/sort/rushingYards/dir/desc"
 
-# User agent to mimic a real browser
-HEADERS = {
-    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-}
+# Output paths (Parquet copy is typed; CSV kept for human inspection)
+OUTPUT_CSV = 'defense_stats.csv'
+OUTPUT_PARQUET = 'defense_stats.parquet'
+STAT_COLUMNS = ['Rushing Yards (Yds)', 'Yards Per Game (Y/G)']
+# Stat cell values that mean "no data" (become NaN without a warning)
+MISSING_VALUES = ['N/A', 'nan', 'None', '']
+
+def typed_defense_stats(df):
+    """
+    Return a copy of `df` with the stat columns as numbers.
+    Thousands separators ("1,886") are stripped first; "N/A" becomes NaN.
+    Any other value that doesn't parse is reported, since it would silently
+    drop that team from the rankings.
+    """
+    typed = {}
+    for col in STAT_COLUMNS:
+        text = df[col].astype(str).str.replace(',', '', regex=False).str.strip()
+        typed[col] = pd.to_numeric(text, errors='coerce')
+        bad = typed[col].isna() & text.notna() & ~text.isin(MISSING_VALUES)
+        if bad.any():
+            print(f"Warning: {bad.sum()} unparseable values in {col}: {text[bad].unique().tolist()}")
+    return df.assign(**typed)
+
 
-def scrape_espn_defense_stats():
+def scrape_espn_defense_stats(session=None):
     """
     Scrapes NFL defense rushing statistics from ESPN.
     Returns a DataFrame with team name, rushing yards (yds), and yards per game (ypg).
+    Pass a `session` (see `scrape_utils.make_session`) to reuse pooled connections.
     """
+    session = session or make_session()
     try:
         # Make request with user agent
-        response = requests.get(URL, headers=HEADERS, timeout=10)
+        response = session.get(URL, headers=HEADERS, timeout=10)
         response.raise_for_status()
         
-        # Parse HTML
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Find the JSON data in the script tag
-        scripts = soup.find_all('script')
-        team_stats = None
-        
-        for script in scripts:
-            if script.string and 'teamStats' in script.string:
-                # Extract teamStats array using regex
-                match = re.search(r'"teamStats":\[(.*?)\],"dictionary"', script.string, re.DOTALL)
-                if match:
-                    team_stats_str = '[' + match.group(1) + ']'
-                    try:
-                        team_stats = json.loads(team_stats_str)
-                        break
-                    except:
-                        pass
-        
-        if team_stats is None:
+        # Pull the page state JSON straight out of the raw bytes (no HTML parse)
+        blob = parse_espnfitt(response.content)
+        if blob is None:
             print("Could not find stats data on the page")
             return None
         
+        team_stats = blob['page']['content']['statistics']['teamStats']
+        
         # Extract team stats from the JSON
         data = []
         for team_data in team_stats:
@@ -80,7 +85,7 @@ def scrape_espn_defense_stats():
 
 if __name__ == "__main__":
     # Scrape the data
-    df = scrape_espn_defense_stats()
+    df = scrape_espn_defense_stats(make_session())
     
     if df is not None:
         print(f"Successfully scraped {len(df)} teams")
@@ -89,8 +94,9 @@ if __name__ == "__main__":
         print("\nColumn names:")
         print(df.columns.tolist())
         
-        # Save to CSV
-        df.to_csv('defense_stats.csv', index=False)
-        print("\nData saved to defense_stats.csv")
+        # Save to CSV and Parquet ("N/A" becomes null in the typed Parquet copy)
+        df.to_csv(OUTPUT_CSV, index=False)
+        typed_defense_stats(df).to_parquet(OUTPUT_PARQUET, compression='snappy', index=False)
+        print(f"\nData saved to {OUTPUT_CSV} and {OUTPUT_PARQUET}")
     else:
         print("Failed to scrape the data")
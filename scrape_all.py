@@ -0,0 +1,116 @@
+"""
+scrape_all.py
+
+Runs every ESPN scraper in one go:
+ - RB rosters and starting RBs from depth charts (`team_rb_snapshot.py`)
+ - defense rushing stats (`defenses.py`)
+
+The roster/depth chart pages are fetched on one event loop with a single
+session, rate limiter and parse pool (see `scrape_utils.open_scraper`). The
+defense scrape is a single request and runs in a thread alongside them.
+
+Results are written as one Parquet bundle, `data/scrape_bundle.parquet/`,
+with one hive-style partition per logical table (`table=rb_player_ids`,
+`table=starting_rbs`, `table=defense_stats`). `csvs_to_sqlite.py` loads the
+bundle directly. `data/team_rb_snapshot.parquet` and each scraper's usual
+CSV and Parquet outputs are still written too (for human inspection, for
+`starting_rbs_gamelog.py`, which reads `data/starting_rbs.csv`, and so the
+scripts that prefer a CSV's `.parquet` twin never see a stale one).
+
+Usage:
+    pip install requests requests-cache aiohttp "aiohttp-client-cache[sqlite]" aiolimiter selectolax pandas pyarrow orjson
+    python scrape_all.py
+"""
+
+import os
+import shutil
+import asyncio
+import logging
+from typing import Dict
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import RB_gamelog
+import defenses
+import starting_rbs
+import team_rb_snapshot
+from scrape_utils import make_session, open_scraper, rows_to_table, save_rows
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s: %(message)s')
+logger = logging.getLogger(__name__)
+
+OUTPUT_DIR = 'data'
+BUNDLE_PATH = os.path.join(OUTPUT_DIR, 'scrape_bundle.parquet')
+
+
+def write_bundle(tables: Dict[str, pa.Table], path: str = BUNDLE_PATH) -> None:
+    """Write each table to its own `table=<name>` partition under `path`.
+
+    Any previous bundle is removed first so stale partitions don't linger.
+    """
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+
+    for name, table in tables.items():
+        partition = os.path.join(path, f'table={name}')
+        os.makedirs(partition, exist_ok=True)
+        pq.write_table(table, os.path.join(partition, 'part-0.parquet'), compression='snappy')
+        logger.info('Wrote %d rows to %s', table.num_rows, partition)
+
+
+async def scrape_all():
+    """Run all scrapers concurrently and return their results as Arrow tables."""
+    async with open_scraper() as scrape:
+        snapshot, df_def = await asyncio.gather(
+            team_rb_snapshot.scrape_snapshot(scrape=scrape),
+            asyncio.to_thread(defenses.scrape_espn_defense_stats, make_session()),
+        )
+
+    if snapshot:
+        team_rb_snapshot.save_snapshot(snapshot)
+
+    rb_rows = team_rb_snapshot.select_rows(snapshot, team_rb_snapshot.ROSTER_RANK, RB_gamelog.OUTPUT_COLUMNS)
+    rb1_rows = team_rb_snapshot.select_rows(snapshot, team_rb_snapshot.STARTER_RANK, starting_rbs.OUTPUT_COLUMNS)
+
+    tables = {}
+    if rb_rows:
+        save_rows(rb_rows, RB_gamelog.OUTPUT_COLUMNS, RB_gamelog.OUTPUT_CSV, RB_gamelog.OUTPUT_PARQUET)
+        tables['rb_player_ids'] = rows_to_table(rb_rows, RB_gamelog.OUTPUT_COLUMNS)
+    else:
+        logger.warning('No RBs found')
+
+    if rb1_rows:
+        save_rows(rb1_rows, starting_rbs.OUTPUT_COLUMNS, starting_rbs.OUTPUT_CSV, starting_rbs.OUTPUT_PARQUET)
+        tables['starting_rbs'] = rows_to_table(rb1_rows, starting_rbs.OUTPUT_COLUMNS)
+    else:
+        logger.warning('No starting RBs found')
+
+    if df_def is not None:
+        df_def.to_csv(defenses.OUTPUT_CSV, index=False)
+        typed = defenses.typed_defense_stats(df_def)
+        typed.to_parquet(defenses.OUTPUT_PARQUET, compression='snappy', index=False)
+        tables['defense_stats'] = pa.Table.from_pandas(typed, preserve_index=False)
+    else:
+        logger.warning('No defense stats scraped')
+
+    return tables
+
+
+def main():
+    """Main entry point."""
+    logger.info('Starting combined ESPN scrape')
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+
+    tables = asyncio.run(scrape_all())
+
+    if not tables:
+        logger.warning('Nothing scraped; bundle not written')
+        return
+
+    write_bundle(tables)
+    logger.info('Saved %d tables to %s', len(tables), BUNDLE_PATH)
+
+
+if __name__ == '__main__':
+    main()
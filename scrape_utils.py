@@ -0,0 +1,365 @@
+"""
+scrape_utils.py
+
+Shared HTTP helpers for the ESPN scrapers.
+
+Bulk scrapes (`team_rb_snapshot.py`) fetch pages concurrently with
+`aiohttp`. Concurrency is bounded by an `asyncio.Semaphore` and the overall
+request rate is capped with a token-bucket `aiolimiter.AsyncLimiter` so we
+don't hit ESPN too hard. The limiter is kept per host, and a 429 response
+pauses that host for its `Retry-After` (growing exponentially while the 429s
+keep coming) before the request is retried. Once a host has kept answering
+429 through more than RETRY_TOTAL pauses, the rest of the batch's requests
+to it fail straight away instead of each waiting out its own retries. Each
+page is handed to a `ProcessPoolExecutor` for parsing as soon as it arrives,
+so HTML parsing runs on all cores instead of blocking the event loop.
+
+Single-page fetches (`defenses.py`, per-team debugging helpers) use a pooled
+`requests.Session` from `make_session()`, which reuses keep-alive connections
+and retries transient errors. The aiohttp path retries the same way.
+
+Both paths cache successful GETs on disk (SQLite). For 24 hours a cached page
+is used without going back to the network; after that it is revalidated with
+a conditional GET (`If-None-Match` / `If-Modified-Since` from its ETag /
+Last-Modified), so unchanged pages come back as a bodiless 304. Delete the
+cache files under `data/` to force a fresh scrape. In the aiohttp path fresh
+cache hits are served before the semaphore and rate limiter, so only real
+network requests are paced and a fully cached re-run is not throttled.
+
+Before the first network request, `open_scraper()` sends one uncached HEAD to
+www.espn.com so DNS, TCP and TLS setup is done once and the real fetches reuse
+a warm keep-alive connection. A run served entirely from cache skips it.
+
+Responses are fetched compressed: both clients send `Accept-Encoding: gzip,
+deflate`, and add `br` when the optional `brotli` package is installed (ESPN
+serves Brotli, which is noticeably smaller for these pages). The header is
+left to the clients so it never advertises an encoding they can't decode.
+
+ESPN pages also inline their full page state as JSON
+(`window['__espnfitt__']=...`); `parse_espnfitt()` slices it straight out of
+the raw bytes and loads it with `orjson`, without building a DOM.
+
+Usage:
+    pip install requests requests-cache aiohttp "aiohttp-client-cache[sqlite]" aiolimiter orjson pyarrow
+    pip install brotli  # optional
+"""
+
+import os
+import csv
+import time
+import asyncio
+import logging
+from collections import defaultdict
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlsplit
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+import aiohttp
+import orjson
+import requests
+import requests_cache
+from aiohttp_client_cache import CachedSession, SQLiteBackend
+from aiolimiter import AsyncLimiter
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+# ESPN user-agent
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+}
+
+# Max number of requests in flight at once
+CONCURRENCY = 8
+
+# Rate limiting settings: at most RATE_LIMIT requests per RATE_PERIOD seconds, per host
+RATE_LIMIT = 5
+RATE_PERIOD = 1.0
+
+# Pause used after a 429 when the response has no Retry-After header
+RETRY_AFTER_DEFAULT = 5.0
+
+# Per-request timeout in seconds
+TIMEOUT = 10
+
+# Number of processes used to parse pages
+PARSE_WORKERS = os.cpu_count()
+
+# Connection pool / retry settings (retries apply to both requests and aiohttp)
+POOL_CONNECTIONS = 16
+POOL_MAXSIZE = 32
+DNS_CACHE_TTL = 300  # seconds
+PREWARM_URL = 'https://www.espn.com/'
+RETRY_TOTAL = 5
+RETRY_BACKOFF = 0.5
+RETRY_STATUSES = [429, 500, 502, 503, 504]
+
+# On-disk response caches (separate files: the two libraries use different schemas)
+HTTP_CACHE = 'data/.http_cache.sqlite'
+AIOHTTP_CACHE = 'data/.aiohttp_cache.sqlite'
+CACHE_EXPIRE = 24 * 60 * 60  # seconds a cached page is used as-is
+CACHE_KEEP = 30 * 24 * 60 * 60  # seconds an expired page is kept for revalidation
+
+# ESPN inlines its full page state as a single JSON assignment in a <script>
+ESPNFITT_PREFIX = b"window['__espnfitt__']="
+SCRIPT_END = b'</script>'
+
+
+def make_session() -> requests.Session:
+    """Create a cached requests Session with connection pooling and retries.
+
+    Keep-alive connections are reused across requests to www.espn.com, and
+    transient errors (429/5xx) are retried with exponential backoff. GET
+    responses are cached in `HTTP_CACHE` for `CACHE_EXPIRE` seconds; after
+    that requests-cache revalidates them with a conditional GET.
+    """
+    retry = Retry(total=RETRY_TOTAL, backoff_factor=RETRY_BACKOFF, status_forcelist=RETRY_STATUSES)
+    adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, max_retries=retry)
+
+    session = requests_cache.CachedSession(HTTP_CACHE, backend='sqlite', expire_after=CACHE_EXPIRE,
+                                           allowable_methods=['GET'])
+    session.mount('https://', adapter)
+    session.headers.update(HEADERS)
+    return session
+
+
+def parse_espnfitt(html: bytes) -> Optional[Dict]:
+    """Return ESPN's inlined page state (`window['__espnfitt__']`), or None.
+
+    The JSON is sliced out of the raw page between the assignment and the end
+    of its <script>, so no HTML parsing is needed.
+    """
+    start = html.find(ESPNFITT_PREFIX)
+    if start == -1:
+        return None
+    start += len(ESPNFITT_PREFIX)
+    end = html.find(SCRIPT_END, start)
+    if end == -1:
+        return None
+    return orjson.loads(html[start:end].rstrip().rstrip(b';'))
+
+
+def retry_after_seconds(value: Optional[str]) -> float:
+    """Parse a Retry-After header (seconds or HTTP date) into seconds to wait."""
+    if not value:
+        return RETRY_AFTER_DEFAULT
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return RETRY_AFTER_DEFAULT
+
+
+async def cached_page(session: CachedSession, url: str) -> Tuple[Optional[bytes], bool]:
+    """Look up `url` in the aiohttp cache; returns `(body, refresh)`.
+
+    `body` is the cached page if it is younger than `CACHE_EXPIRE`, so it can
+    be used without touching the network (or the rate limiter). Otherwise it
+    is None and `refresh` says whether to revalidate: the cache keeps pages
+    for `CACHE_KEEP` seconds, and a stale page with an ETag or Last-Modified
+    validator is refreshed with a conditional GET. A stale page without
+    validators is dropped so it gets fetched again in full.
+    """
+    key = session.cache.create_key('GET', url)
+    cached = await session.cache.get_response(key)
+    if cached is None:
+        return None, False
+
+    # created_at is a naive UTC datetime
+    age = datetime.now(timezone.utc).replace(tzinfo=None) - cached.created_at
+    if age < timedelta(seconds=CACHE_EXPIRE):
+        return await cached.read(), False
+    if 'ETag' in cached.headers or 'Last-Modified' in cached.headers:
+        return None, True
+
+    await session.cache.delete(key)
+    return None, False
+
+
+async def fetch(session: CachedSession, url: str, sem: asyncio.Semaphore, limiter: AsyncLimiter,
+                paused_until: Dict[str, float], throttled: Dict[str, int], refresh: bool = False) -> bytes:
+    """Fetch a single URL and return the raw response body.
+
+    `limiter` is the rate limiter for the URL's host. Connection errors and
+    RETRY_STATUSES responses are retried up to RETRY_TOTAL times with
+    exponential backoff (RETRY_BACKOFF * 2**attempt), like `make_session()`.
+    On a 429 the whole host is paused instead (recorded in `paused_until`,
+    shared by all requests) for the server's Retry-After, or longer if the
+    host keeps answering 429. `throttled` counts each host's strikes (also
+    shared): a 429 is a new strike only for a request sent after the host's
+    last pause ended, so one burst of 429s to concurrent requests is a single
+    strike. Any other response resets the count. Past RETRY_TOTAL strikes the
+    host is given up on and requests to it raise `aiohttp.ClientError`
+    without being sent.
+
+    With `refresh`, a cached copy is revalidated with a conditional GET (see
+    `cached_page`); a 304 returns the cached body.
+    """
+    host = urlsplit(url).hostname
+    for attempt in range(RETRY_TOTAL + 1):
+        last_try = attempt == RETRY_TOTAL
+        backoff = RETRY_BACKOFF * 2 ** attempt
+        async with sem, limiter:
+            # Wait out a pause another request to this host was asked for
+            delay = paused_until.get(host, 0.0) - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if throttled.get(host, 0) > RETRY_TOTAL:
+                raise aiohttp.ClientError(f'Skipping {url}: {host} keeps rate limiting requests')
+
+            logger.info('Fetching %s', url)
+            sent = time.monotonic()
+            try:
+                async with session.get(url, refresh=refresh) as resp:
+                    if resp.status != 429:
+                        throttled[host] = 0
+                    elif sent >= paused_until.get(host, 0.0):
+                        # Requests already in flight when the host was paused don't add strikes
+                        throttled[host] = throttled.get(host, 0) + 1
+                        if throttled[host] == RETRY_TOTAL + 1:
+                            logger.error('Still rate limited by %s after %d pauses; skipping its remaining requests',
+                                         host, RETRY_TOTAL)
+                    strikes = throttled.get(host, 0)
+
+                    if resp.status not in RETRY_STATUSES or last_try or strikes > RETRY_TOTAL:
+                        resp.raise_for_status()
+                        return await resp.read()
+
+                    if resp.status == 429:
+                        # Honor Retry-After, backing off further while the 429s continue
+                        wait = max(retry_after_seconds(resp.headers.get('Retry-After')),
+                                   RETRY_BACKOFF * 2 ** max(strikes - 1, 0))
+                        paused_until[host] = max(paused_until.get(host, 0.0), time.monotonic() + wait)
+                        logger.warning('429 from %s; pausing requests to %s for %.1fs', url, host, wait)
+                        backoff = 0
+                    else:
+                        logger.warning('%d from %s; retrying in %.1fs', resp.status, url, backoff)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if last_try:
+                    raise
+                logger.warning('Error fetching %s (%r); retrying in %.1fs', url, e, backoff)
+
+        # Back off outside the semaphore so other requests can proceed
+        await asyncio.sleep(backoff)
+
+
+async def prewarm(session: CachedSession, url: str) -> None:
+    """Open a keep-alive connection to `url`'s host with a HEAD request.
+
+    The cache is bypassed so the request really reaches the network. Errors
+    are only logged: the real fetches retry on their own.
+    """
+    try:
+        async with session.disabled():
+            async with session.head(url, allow_redirects=False):
+                pass
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.warning('Could not prewarm connection to %s: %r', url, e)
+
+
+@asynccontextmanager
+async def open_scraper() -> AsyncIterator[Callable]:
+    """Open one aiohttp session, rate limiter and parse pool for a scrape run.
+
+    Yields a coroutine function `scrape(url, parse, key)` that fetches `url`
+    and returns `parse(html, key)` computed in a worker process. Scrapers that
+    run side by side (see `scrape_all.py`) share it, so the concurrency and
+    rate limits apply to all of their requests together.
+
+    Fresh cache hits skip the semaphore, rate limiter and network entirely.
+    The connection prewarm runs once, before the first request that does go
+    to the network.
+
+    `parse` must be a module-level function so it can be sent to the pool.
+    """
+    loop = asyncio.get_running_loop()
+    sem = asyncio.Semaphore(CONCURRENCY)
+    limiters = defaultdict(lambda: AsyncLimiter(RATE_LIMIT, RATE_PERIOD))  # one per host
+    paused_until = {}  # host -> time.monotonic() until which requests wait (429s)
+    throttled = {}  # host -> consecutive 429s; past RETRY_TOTAL its requests fail fast
+    timeout = aiohttp.ClientTimeout(total=TIMEOUT)
+
+    # Keep-alive pool sized to the concurrency cap; DNS lookups are cached
+    connector = aiohttp.TCPConnector(limit=CONCURRENCY, limit_per_host=CONCURRENCY, ttl_dns_cache=DNS_CACHE_TTL)
+    cache = SQLiteBackend(AIOHTTP_CACHE, expire_after=CACHE_KEEP)
+
+    with ProcessPoolExecutor(max_workers=PARSE_WORKERS) as pool:
+        async with CachedSession(cache=cache, timeout=timeout, connector=connector, headers=HEADERS) as session:
+            prewarmed = None  # prewarm task, started on the first cache miss
+
+            async def prewarm_once():
+                async with limiters[urlsplit(PREWARM_URL).hostname]:
+                    await prewarm(session, PREWARM_URL)
+
+            async def scrape(url, parse, key):
+                nonlocal prewarmed
+                html, refresh = await cached_page(session, url)
+                if html is None:
+                    if prewarmed is None:
+                        prewarmed = asyncio.ensure_future(prewarm_once())
+                    await prewarmed
+                    limiter = limiters[urlsplit(url).hostname]
+                    html = await fetch(session, url, sem, limiter, paused_until, throttled, refresh)
+                try:
+                    return await loop.run_in_executor(pool, parse, html, key)
+                except Exception:
+                    logger.exception('Error parsing %s', url)
+                    raise
+
+            yield scrape
+
+
+async def scrape_pages(urls: List[str], parse: Callable[[bytes, Any], Any], keys: List[Any],
+                       scrape: Optional[Callable] = None) -> List[Any]:
+    """Fetch all URLs concurrently and parse each page in a worker process.
+
+    `parse(html, key)` is called with each page body and the matching entry of
+    `keys` (e.g. the team abbreviation). Pass `scrape` from `open_scraper()` to
+    share a session with other scrapers; otherwise one is opened for this call.
+
+    Returns a list in the same order as `urls`. Each entry is either the parse
+    result or the exception raised while fetching/parsing that page, so one
+    failed team doesn't abort the whole scrape.
+    """
+    if scrape is None:
+        async with open_scraper() as scrape:
+            return await scrape_pages(urls, parse, keys, scrape)
+
+    tasks = [scrape(url, parse, key) for url, key in zip(urls, keys)]
+    return await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def write_csv_rows(rows: List[Dict], columns: List[str], csv_path: str) -> None:
+    """Write row dicts to a CSV file with `csv.DictWriter`."""
+    with open(csv_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=columns, lineterminator='\n')
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def rows_to_table(rows: List[Dict], columns: List[str]):
+    """Convert row dicts to a `pyarrow.Table` with string columns."""
+    # Imported here so scrapers that only need CSV don't pay for pyarrow
+    import pyarrow as pa
+
+    return pa.Table.from_pylist(rows, schema=pa.schema([(col, pa.string()) for col in columns]))
+
+
+def save_rows(rows: List[Dict], columns: List[str], csv_path: str, parquet_path: str) -> None:
+    """Write scraped rows to CSV (for humans) and Parquet (for the pipeline).
+
+    Scrape results are tiny, so they're written with `csv.DictWriter` and
+    `pyarrow` directly rather than building a pandas DataFrame.
+    """
+    write_csv_rows(rows, columns, csv_path)
+
+    import pyarrow.parquet as pq
+
+    pq.write_table(rows_to_table(rows, columns), parquet_path, compression='snappy')
@@ -2,37 +2,36 @@
 starting_rbs.py
 
 Scrape ESPN depth chart pages to determine the starting running back (RB1)
-for each NFL team and save results to `data/starting_rbs.csv`.
+for each NFL team and save results to `data/starting_rbs.csv` (and `.parquet`).
 
 Notes:
-- Uses `requests` + `BeautifulSoup`.
-- Sleeps 1 second between requests to be polite.
+- Depth charts are fetched together with the roster pages by
+  `team_rb_snapshot.py`; this script writes the RB1 rows from
+  `data/team_rb_snapshot.parquet`, running that scrape first if the snapshot
+  is missing or stale. `scrape_all_starting_rbs` scrapes a subset of teams.
+- Pages are parsed with `selectolax`.
 - Includes basic error handling; skips teams that fail.
 
 Run:
-    pip install requests beautifulsoup4 pandas
+    pip install requests requests-cache aiohttp "aiohttp-client-cache[sqlite]" aiolimiter orjson selectolax pyarrow
     python starting_rbs.py
 """
 
 import os
 import re
-import time
+import asyncio
 import logging
-from typing import List, Dict, Optional
+from typing import Dict, List, Optional
 
 import requests
-from bs4 import BeautifulSoup
-import pandas as pd
+from selectolax.lexbor import LexborHTMLParser, LexborNode
+
+from scrape_utils import HEADERS, save_rows
 
 # Logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s: %(message)s')
 logger = logging.getLogger(__name__)
 
-# ESPN user-agent
-HEADERS = {
-    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-}
-
 # Team abbreviations used by ESPN in URLs
 TEAM_ABBREVS = [
     'nyg','cin','buf','mia','chi','wsh','atl','ten','min','nyj','car','dal',
@@ -43,28 +42,32 @@ TEAM_ABBREVS = [
 DEPTH_URL = 'https://www.espn.com/nfl/team/depth/_/name/{team_abbrev}'
 OUTPUT_DIR = 'data'
 OUTPUT_CSV = os.path.join(OUTPUT_DIR, 'starting_rbs.csv')
+OUTPUT_PARQUET = os.path.join(OUTPUT_DIR, 'starting_rbs.parquet')
+OUTPUT_COLUMNS = ['team', 'player_name', 'player_id', 'depth_rank']
 
 PLAYER_ID_RE = re.compile(r'/player/_/id/(\d+)')
 
-SLEEP_SECONDS = 1.0
+# CSS selectors for the depth chart (positions table, then players table)
+DEPTH_TABLES_SELECTOR = 'div.nfl-depth-table table'
+PLAYER_LINK_SELECTOR = 'a[href*="/player/_/id/"]'
 
 
-def extract_player_from_link(a_tag) -> Optional[Dict[str,str]]:
-    """Given an <a> tag to a player profile, extract name and player_id."""
-    if not a_tag:
+def extract_player_from_link(a_tag: Optional[LexborNode]) -> Optional[Dict[str,str]]:
+    """Given an <a> node to a player profile, extract name and player_id."""
+    if a_tag is None:
         return None
-    href = a_tag.get('href', '')
+    href = a_tag.attributes.get('href') or ''
     m = PLAYER_ID_RE.search(href)
     if not m:
         return None
     player_id = m.group(1)
-    name = a_tag.get_text(strip=True)
+    name = a_tag.text(strip=True)
     if not name:
         return None
     return {'player_name': name, 'player_id': player_id}
 
 
-def extract_starting_rb_from_depth_table(soup: BeautifulSoup) -> Optional[Dict[str, str]]:
+def extract_starting_rb_from_depth_table(tree: LexborHTMLParser) -> Optional[Dict[str, str]]:
     """Extract the starting RB from ESPN's depth chart table structure.
 
     ESPN depth charts use a two-table layout:
@@ -72,50 +75,35 @@ def extract_starting_rb_from_depth_table(soup: BeautifulSoup) -> Optional[Dict[s
     - Table 1: Player names and links
 
     We find the RB row in Table 0, then extract the first player link from
-    the corresponding row in Table 1.
+    the row at the same position in Table 1. Header rows live in <thead>, so
+    only <tbody> rows are considered.
 
     Returns dict with player_name and player_id, or None if not found.
     """
-    depth_table = soup.find('div', class_='nfl-depth-table')
-    if not depth_table:
-        return None
-
-    tables = depth_table.find_all('table')
+    tables = tree.css(DEPTH_TABLES_SELECTOR)
     if len(tables) < 2:
         return None
 
     pos_table = tables[0]  # Positions
     player_table = tables[1]  # Players
 
-    # Extract rows (skip header)
-    pos_rows = pos_table.find_all('tr')[1:]
-    player_rows = player_table.find_all('tr')[1:]
-
-    if len(pos_rows) != len(player_rows):
-        logger.debug('Position and player row counts mismatch')
-
-    # Find which row is the RB
-    rb_row_idx = None
-    for i, row in enumerate(pos_rows):
-        text = row.get_text(strip=True)
-        if 'RB' in text:
-            rb_row_idx = i
-            break
+    # Find which body row is the RB (stops at the first match)
+    pos_rows = pos_table.css('tbody tr')
+    rb_row_idx = next((i for i, row in enumerate(pos_rows) if 'RB' in row.text(strip=True)), None)
 
     if rb_row_idx is None:
         logger.debug('RB position not found in depth chart')
         return None
 
-    # Get the corresponding player row
-    if rb_row_idx >= len(player_rows):
+    # Get the corresponding player row (nth-child is 1-based)
+    player_row = player_table.css_first(f'tbody tr:nth-child({rb_row_idx + 1})')
+    if player_row is None:
         logger.debug('RB row index out of range for player table')
         return None
 
-    player_row = player_rows[rb_row_idx]
-
     # Extract the first player link (the starter)
-    a_tag = player_row.find('a', href=PLAYER_ID_RE)
-    if not a_tag:
+    a_tag = player_row.css_first(PLAYER_LINK_SELECTOR)
+    if a_tag is None:
         logger.debug('No player link in RB row')
         return None
 
@@ -124,7 +112,10 @@ def extract_starting_rb_from_depth_table(soup: BeautifulSoup) -> Optional[Dict[s
 
 
 def get_starting_rb_for_team(team_abbrev: str, session: requests.Session) -> Optional[Dict]:
-    """Fetch depth chart page and extract the first RB (RB1) if available."""
+    """Fetch depth chart page for a single team and extract RB1 if available.
+
+    Synchronous helper, handy for debugging one team at a time.
+    """
     url = DEPTH_URL.format(team_abbrev=team_abbrev)
     logger.info('Fetching depth chart for %s -> %s', team_abbrev, url)
 
@@ -135,10 +126,15 @@ def get_starting_rb_for_team(team_abbrev: str, session: requests.Session) -> Opt
         logger.error('Request error for %s: %s', team_abbrev, e)
         return None
 
-    soup = BeautifulSoup(resp.content, 'html.parser')
+    return parse_depth_html(resp.content, team_abbrev)
+
+
+def parse_depth_html(html: bytes, team_abbrev: str) -> Optional[Dict]:
+    """Parse a depth chart page and extract the first RB (RB1) if available."""
+    tree = LexborHTMLParser(html)
 
     # Extract RB from depth table
-    player = extract_starting_rb_from_depth_table(soup)
+    player = extract_starting_rb_from_depth_table(tree)
 
     if not player:
         logger.warning('Could not extract RB for %s', team_abbrev)
@@ -153,29 +149,18 @@ def get_starting_rb_for_team(team_abbrev: str, session: requests.Session) -> Opt
     }
 
 
-def scrape_all_starting_rbs(team_abbrevs: List[str] = None) -> pd.DataFrame:
-    team_abbrevs = team_abbrevs or TEAM_ABBREVS
-    session = requests.Session()
-
-    rows = []
-    for team in team_abbrevs:
-        try:
-            res = get_starting_rb_for_team(team, session)
-            if res:
-                rows.append(res)
-                logger.info('Found RB1 for %s: %s (%s)', team, res['player_name'], res['player_id'])
-            else:
-                logger.info('No RB1 found for %s', team)
-        except requests.exceptions.RequestException as e:
-            logger.error('Request error for %s: %s', team, e)
-        except Exception as e:
-            logger.exception('Error extracting RB1 for %s: %s', team, e)
+async def scrape_all_starting_rbs(team_abbrevs: List[str] = None, scrape=None) -> List[Dict]:
+    """Scrape all depth charts and return a list of RB1 rows (see `OUTPUT_COLUMNS`).
 
-        # rate limit
-        time.sleep(SLEEP_SECONDS)
+    Wrapper over `team_rb_snapshot.scrape_snapshot`, which fetches each team's
+    depth chart together with its roster page.
+    Pass `scrape` from `scrape_utils.open_scraper()` to share a session.
+    """
+    # Imported here because team_rb_snapshot imports this module
+    import team_rb_snapshot
 
-    df = pd.DataFrame(rows, columns=['team', 'player_name', 'player_id', 'depth_rank'])
-    return df
+    rows = await team_rb_snapshot.scrape_snapshot(team_abbrevs, scrape)
+    return team_rb_snapshot.select_rows(rows, team_rb_snapshot.STARTER_RANK, OUTPUT_COLUMNS)
 
 
 def ensure_output_dir():
@@ -183,12 +168,23 @@ def ensure_output_dir():
         os.makedirs(OUTPUT_DIR, exist_ok=True)
 
 
-if __name__ == '__main__':
-    logger.info('Starting starting_rbs scraper for %d teams', len(TEAM_ABBREVS))
-    df = scrape_all_starting_rbs()
-    if df.empty:
+async def main_async():
+    """Main entry point.
+
+    Writes the RB1 rows from the team RB snapshot (`team_rb_snapshot.py`,
+    re-scraped if missing or stale) to `OUTPUT_CSV` / `OUTPUT_PARQUET`.
+    """
+    # Imported here because team_rb_snapshot imports this module
+    import team_rb_snapshot
+
+    rows = await team_rb_snapshot.load_or_scrape(team_rb_snapshot.STARTER_RANK, OUTPUT_COLUMNS)
+    if not rows:
         logger.warning('No starting RBs found; nothing to save')
     else:
         ensure_output_dir()
-        df.to_csv(OUTPUT_CSV, index=False)
-        logger.info('Saved %d starting RBs to %s', len(df), OUTPUT_CSV)
+        save_rows(rows, OUTPUT_COLUMNS, OUTPUT_CSV, OUTPUT_PARQUET)
+        logger.info('Saved %d starting RBs to %s and %s', len(rows), OUTPUT_CSV, OUTPUT_PARQUET)
+
+
+if __name__ == '__main__':
+    asyncio.run(main_async())
@@ -3,49 +3,102 @@ starting_rbs_gamelog.py
 
 Fetches game logs for the 32 starting NFL running backs from ESPN.
 Reads player IDs from data/starting_rbs.csv and scrapes their individual game logs.
-Saves combined results to data/starting_rbs_gamelog.csv.
+Saves combined results to data/starting_rbs_gamelog.csv (for humans) and
+data/starting_rbs_gamelog.parquet (zstd, typed; preferred by the downstream
+scripts).
 
 Usage:
-    pip install requests beautifulsoup4 pandas
+    pip install requests requests-cache aiohttp "aiohttp-client-cache[sqlite]" aiolimiter orjson selectolax pandas pyarrow
     python starting_rbs_gamelog.py
 
 Notes:
 - Uses ESPN player gamelog pages: https://www.espn.com/nfl/player/gamelog/_/id/{player_id}
-- Rate-limits requests with time.sleep to avoid overloading ESPN.
+- Fetches all game logs concurrently with `aiohttp` (see `scrape_utils.py`);
+  the shared concurrency cap and rate limiter keep the load on ESPN polite.
+- Reads the game log from the JSON page state ESPN inlines in every page
+  (`window['__espnfitt__']`, see `scrape_utils.parse_espnfitt`), so normally
+  no HTML is parsed at all. Pages without that JSON game log fall back to
+  parsing the game log table with `selectolax` (lexbor C parser); only the
+  table's markup is handed to the parser.
+- Each player's games are appended to the CSV as soon as their page is
+  parsed (rows are in completion order, not input order).
 - Skips a player if any error occurs while fetching/parsing.
 """
 
 import os
-import time
+import csv
+import asyncio
 import logging
-from typing import Dict, List
+from datetime import datetime
+from itertools import islice
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
 
 import requests
-from bs4 import BeautifulSoup
+from selectolax.lexbor import LexborHTMLParser
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from scrape_utils import HEADERS, make_session, open_scraper, parse_espnfitt
 
 # Logging setup
 logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s: %(message)s')
 logger = logging.getLogger(__name__)
 
-# ESPN user-agent
-HEADERS = {
-    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-}
-
 # Paths
 INPUT_CSV = 'data/starting_rbs.csv'
 OUTPUT_DIR = 'data'
 OUTPUT_CSV = os.path.join(OUTPUT_DIR, 'starting_rbs_gamelog.csv')
+OUTPUT_PARQUET = os.path.join(OUTPUT_DIR, 'starting_rbs_gamelog.parquet')
 
+# Player game log URL template
+GAMELOG_URL = 'https://www.espn.com/nfl/player/gamelog/_/id/{player_id}'
 
-def fetch_player_gamelog(player_id: int, player_name: str, team: str, session: requests.Session) -> List[Dict]:
-    """
-    Fetch game log for a specific player from ESPN gamelog page.
-    Returns a list of dicts with game statistics.
-    Format: Date, Opponent, Result, [Rushing: CAR, YDS, AVG, TD, LNG], [Receiving: REC, TGTS, YDS, ...]
+# Game log table schema: (column name, cell index, dtype)
+# Row format: Date, OPP, Result, CAR, YDS, AVG, TD, LNG, REC, TGTS, YDS, AVG, TD, LNG, ...
+GAME_SCHEMA = (('date', 0, 'str'), ('opponent', 1, 'str'), ('result', 2, 'str'))
+RUSHING_SCHEMA = (('rushing_attempts', 3, 'Int64'), ('rushing_yards', 4, 'Int64'), ('rushing_avg', 5, 'float64'),
+                  ('rushing_td', 6, 'Int64'), ('rushing_lng', 7, 'Int64'))
+RECEIVING_SCHEMA = (('receiving_receptions', 8, 'Int64'), ('receiving_targets', 9, 'Int64'),
+                    ('receiving_yards', 10, 'Int64'))
+GAMELOG_SCHEMA = GAME_SCHEMA + RUSHING_SCHEMA + RECEIVING_SCHEMA
+
+GAMELOG_DTYPES = {name: dtype for name, _, dtype in GAMELOG_SCHEMA}
+
+# Numeric columns (converted with pd.to_numeric; unparseable cells become missing)
+STAT_COLUMNS = [name for name, _, _ in RUSHING_SCHEMA + RECEIVING_SCHEMA]
+INT_COLUMNS = [name for name in STAT_COLUMNS if GAMELOG_DTYPES[name] == 'Int64']
+RECEIVING_COLUMNS = [name for name, _, _ in RECEIVING_SCHEMA]
+OUTPUT_COLUMNS = ['player_id', 'player_name', 'team'] + [name for name, _, _ in GAMELOG_SCHEMA]
+
+# Game log node of ESPN's inlined page state. It holds the stat rows per
+# season group ('groups' -> 'tbls' -> 'events': {'id', 'stats'}) and the game
+# details by event id ('events': {'gameDate', 'atVs', 'opp', 'res'}).
+GAMELOG_JSON_PATH = ('page', 'content', 'player', 'gmlog')
+
+# Game dates are shown on the page in US Eastern time (e.g. 'Sun 9/7')
+GAME_TZ = ZoneInfo('America/New_York')
+
+# Game log pages wrap the table in a large navbar, footer and inline scripts;
+# only the bytes of the first table in the <body> are parsed.
+BODY_START = b'<body'
+TABLE_START = b'<table'
+TABLE_END = b'</table>'
+
+# Arrow types for the Parquet output (nullable, so missing stats stay missing)
+ARROW_TYPES = {'str': pa.string(), 'Int64': pa.int64(), 'float64': pa.float64()}
+OUTPUT_SCHEMA = pa.schema([('player_id', pa.int64()), ('player_name', pa.string()), ('team', pa.string())] +
+                          [(name, ARROW_TYPES[dtype]) for name, _, dtype in GAMELOG_SCHEMA])
+
+
+def fetch_player_gamelog(player_id: int, player_name: str, team: str, session: requests.Session = None) -> List[Dict]:
+    """Fetch and parse the game log for a single player.
+
+    Synchronous helper, handy for debugging one player at a time.
     """
-    url = f'https://www.espn.com/nfl/player/gamelog/_/id/{player_id}'
+    session = session or make_session()
+    url = GAMELOG_URL.format(player_id=player_id)
     logger.info('Fetching game log for %s (ID: %s)', player_name, player_id)
 
     try:
@@ -55,104 +108,186 @@ def fetch_player_gamelog(player_id: int, player_name: str, team: str, session: r
         logger.error('Request error for %s (%s): %s', player_name, player_id, e)
         return []
 
-    soup = BeautifulSoup(resp.content, 'html.parser')
-    games = []
+    return parse_gamelog_html(resp.content, (player_id, player_name, team))
 
-    try:
-        # Find the game log table (first table on the page)
-        tables = soup.find_all('table')
-        
-        if not tables:
-            logger.warning('No tables found for %s', player_name)
-            return []
 
-        table = tables[0]
-        rows = table.find_all('tr')
+def first_table_html(html: bytes) -> bytes:
+    """Return the markup of the first <table> in `html` (unchanged if none).
 
-        # Skip header rows (first 2 rows are headers with season info and column labels)
-        for row in rows[2:]:
-            cells = row.find_all('td')
-            if len(cells) < 8:  # Need at least: Date, Opp, Result, CAR, YDS, AVG, TD, LNG
-                continue
+    The search starts at <body>, so '<table' strings inside <head> scripts
+    are skipped.
+    """
+    start = html.find(TABLE_START, max(html.find(BODY_START), 0))
+    end = html.find(TABLE_END, start)
+    if start == -1 or end == -1:
+        return html
+    return html[start:end + len(TABLE_END)]
 
-            try:
-                cell_texts = [cell.get_text(strip=True) for cell in cells]
-
-                # Extract game info
-                # Row format: Date, OPP, Result, CAR, YDS, AVG, TD, LNG, REC, TGTS, YDS, ...
-                game_data = {
-                    'player_id': player_id,
-                    'player_name': player_name,
-                    'team': team,
-                    'date': cell_texts[0],
-                    'opponent': cell_texts[1],
-                    'result': cell_texts[2],
-                }
-
-                # Rushing stats (columns 3-7: CAR, YDS, AVG, TD, LNG)
-                if len(cell_texts) > 6:
-                    try:
-                        game_data['rushing_attempts'] = int(cell_texts[3]) if cell_texts[3] else None
-                        game_data['rushing_yards'] = int(cell_texts[4]) if cell_texts[4] else None
-                        game_data['rushing_avg'] = float(cell_texts[5]) if cell_texts[5] else None
-                        game_data['rushing_td'] = int(cell_texts[6]) if cell_texts[6] else None
-                        game_data['rushing_lng'] = int(cell_texts[7]) if cell_texts[7] and cell_texts[7].isdigit() else None
-                    except (ValueError, IndexError) as e:
-                        logger.debug('Error parsing rushing stats for %s: %s', player_name, e)
-
-                # Receiving stats (columns 8+: REC, TGTS, YDS, AVG, TD, LNG)
-                if len(cell_texts) > 13:
-                    try:
-                        game_data['receiving_receptions'] = int(cell_texts[8]) if cell_texts[8] else None
-                        game_data['receiving_targets'] = int(cell_texts[9]) if cell_texts[9] else None
-                        game_data['receiving_yards'] = int(cell_texts[10]) if cell_texts[10] else None
-                    except (ValueError, IndexError) as e:
-                        logger.debug('Error parsing receiving stats for %s: %s', player_name, e)
-
-                games.append(game_data)
-
-            except Exception as e:
-                logger.debug('Error parsing game row for %s: %s', player_name, e)
-                continue
 
-        logger.info('Found %d games for %s', len(games), player_name)
+def parse_gamelog_html(html: bytes, player: Tuple[int, str, str]) -> List[Dict]:
+    """
+    Parse a player's ESPN gamelog page.
+    `player` is a (player_id, player_name, team) tuple.
+    Returns a list of dicts with game statistics.
 
+    The rows come from the page's JSON game log when it has one. Otherwise
+    only the first table's markup is parsed, and if that yields no games the
+    full page is parsed instead.
+    """
+    player_name = player[1]
+    try:
+        cell_rows = gamelog_rows_from_espnfitt(html)
+        if cell_rows is None:
+            table_html = first_table_html(html)
+            cell_rows = gamelog_rows_from_table(table_html)
+            if not cell_rows and len(table_html) < len(html):
+                logger.debug('No games in trimmed game log page for %s; parsing full page', player_name)
+                cell_rows = gamelog_rows_from_table(html)
+
+        if cell_rows is None:
+            logger.warning('No tables found for %s', player_name)
+            return []
+
+        games = games_from_cell_rows(cell_rows, player)
     except Exception as e:
         logger.error('Error processing game log page for %s: %s', player_name, e)
         return []
 
+    logger.info('Found %d games for %s', len(games), player_name)
     return games
 
 
-def scrape_all_starting_rb_gamelogs(input_csv: str = INPUT_CSV) -> List[Dict]:
-    """
-    Read starting RBs from CSV and fetch game logs for each.
-    Returns combined list of game entries.
+def gamelog_rows_from_espnfitt(html: bytes) -> Optional[List[List[str]]]:
+    """Build the game log's table rows (cell texts) from ESPN's JSON page state.
+
+    Rows look like the page's table rows: Date, Opponent, Result, then the
+    stats in column order. Only the first season group is used (the games
+    the first table shows). Returns None if the page has no JSON game log
+    in the expected layout, so the caller can fall back to the HTML table.
     """
-    # Read starting RBs
     try:
-        df = pd.read_csv(input_csv)
-        logger.info('Loaded %d starting RBs from %s', len(df), input_csv)
-    except Exception as e:
-        logger.error('Failed to read %s: %s', input_csv, e)
+        gamelog = parse_espnfitt(html)
+        for key in GAMELOG_JSON_PATH:
+            gamelog = gamelog[key]
+        details = gamelog['events']
+
+        cell_rows = []
+        for tbl in gamelog['groups'][0]['tbls']:
+            for event in tbl['events']:
+                game = details[event['id']]
+                played = datetime.fromisoformat(game['gameDate'].replace('Z', '+00:00')).astimezone(GAME_TZ)
+                cells = [f"{played:%a} {played.month}/{played.day}",
+                         f"{game['atVs']}{game['opp']['abbr']}",
+                         f"{game['res']['abbr']}{game['res']['score']}"]
+                cells.extend(str(stat) for stat in event['stats'])
+                # Same minimum as the table: Date, Opp, Result, CAR, YDS, AVG, TD, LNG
+                if len(cells) >= 8:
+                    cell_rows.append(cells)
+    except (AttributeError, KeyError, IndexError, TypeError, ValueError) as e:
+        logger.debug('No usable JSON game log (%r); falling back to the HTML table', e)
+        return None
+
+    return cell_rows
+
+
+def gamelog_rows_from_table(html: bytes) -> Optional[List[List[str]]]:
+    """Return the cell texts of the game rows in the first table in `html`.
+
+    Returns None if `html` has no table.
+    """
+    # Raw bytes are parsed as UTF-8 (ESPN's encoding) with no detection pass
+    tree = LexborHTMLParser(html)
+
+    # Find the game log table (first table on the page; stops at the first match)
+    table = tree.css_first('table')
+    if table is None:
+        return None
+
+    # Skip header rows (first 2 rows are headers with season info and column labels)
+    # Need at least: Date, Opp, Result, CAR, YDS, AVG, TD, LNG
+    cell_rows = []
+    append_row = cell_rows.append
+    for row in islice(table.css('tr'), 2, None):
+        # A row's cells are its direct children; no per-row selector match needed
+        cells = [cell for cell in row.iter() if cell.tag == 'td']
+        if len(cells) >= 8:
+            append_row([cell.text(strip=True) for cell in cells])
+    return cell_rows
+
+
+def games_from_cell_rows(cell_rows: List[List[str]], player: Tuple[int, str, str]) -> List[Dict]:
+    """Type the game rows' cells with the game log schema; returns one dict per game.
+
+    Format: Date, Opponent, Result, [Rushing: CAR, YDS, AVG, TD, LNG], [Receiving: REC, TGTS, YDS, ...]
+    """
+    if not cell_rows:
         return []
+    player_id, player_name, team = player
+
+    # Pick the schema's cells by index (short rows are padded with None)
+    page = pd.DataFrame(cell_rows).reindex(columns=[idx for _, idx, _ in GAMELOG_SCHEMA])
+    page.columns = [name for name, _, _ in GAMELOG_SCHEMA]
 
-    session = requests.Session()
-    all_games = []
+    # Convert every stat column at once; blanks and non-numbers become NaN
+    stats = page[STAT_COLUMNS].apply(pd.to_numeric, errors='coerce')
+    # Fractional values can't be counts; treat them as missing
+    stats[INT_COLUMNS] = stats[INT_COLUMNS].where(stats[INT_COLUMNS] % 1 == 0)
 
-    for idx, row in df.iterrows():
-        player_id = row['player_id']
-        player_name = row['player_name']
-        team = row['team']
+    # Receiving stats only for rows with the full receiving block (REC, TGTS, YDS, AVG, TD, LNG)
+    no_receiving = [len(texts) <= 13 for texts in cell_rows]
+    stats.loc[no_receiving, RECEIVING_COLUMNS] = float('nan')
 
-        games = fetch_player_gamelog(player_id, player_name, team, session)
-        all_games.extend(games)
+    # Nullable Int64 keeps counts as integers even when some games are missing them
+    page[STAT_COLUMNS] = stats
+    page = page.astype(GAMELOG_DTYPES)
 
-        # Rate limiting: sleep 1 second between requests
-        time.sleep(1.0)
+    page.insert(0, 'player_id', player_id)
+    page.insert(1, 'player_name', player_name)
+    page.insert(2, 'team', team)
+    # NaN -> None so missing stats are written as empty CSV fields
+    return page.astype(object).where(page.notna(), None).to_dict('records')
 
-    logger.info('Total games collected: %d', len(all_games))
-    return all_games
+
+async def scrape_player_gamelog(scrape: Callable, player: Tuple[int, str, str]) -> Tuple[Tuple, Any]:
+    """Scrape one player's game log; returns (player, games or the exception raised)."""
+    try:
+        return player, await scrape(GAMELOG_URL.format(player_id=player[0]), parse_gamelog_html, player)
+    except Exception as e:
+        return player, e
+
+
+async def scrape_all_starting_rb_gamelogs(write_games: Callable[[List[Dict]], Any],
+                                          input_csv: str = INPUT_CSV) -> int:
+    """
+    Read starting RBs from CSV and fetch game logs for each (concurrently).
+    Each player's games are passed to `write_games` as soon as they're parsed.
+    Returns the total number of games written.
+    """
+    # Read starting RBs
+    try:
+        df = pd.read_csv(input_csv, dtype={'player_id': 'int64', 'player_name': 'string', 'team': 'string'})
+        logger.info('Loaded %d starting RBs from %s', len(df), input_csv)
+    except Exception as e:
+        logger.error('Failed to read %s: %s', input_csv, e)
+        return 0
+
+    players = [(row.player_id, row.player_name, row.team) for row in df.itertuples(index=False)]
+
+    # Fetch every game log concurrently; each is parsed in a worker process.
+    # The shared semaphore and rate limiter replace the old 1s sleep.
+    total = 0
+    async with open_scraper() as scrape:
+        tasks = [scrape_player_gamelog(scrape, player) for player in players]
+        for next_done in asyncio.as_completed(tasks):
+            (player_id, player_name, _), games = await next_done
+            if isinstance(games, BaseException):
+                logger.error('Error scraping game log for %s (%s): %s', player_name, player_id, games)
+                continue
+            write_games(games)
+            total += len(games)
+
+    logger.info('Total games collected: %d', total)
+    return total
 
 
 def main():
@@ -162,20 +297,37 @@ def main():
     # Ensure output directory exists
     os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-    # Scrape all game logs
-    all_games = scrape_all_starting_rb_gamelogs()
+    # Scrape all game logs, appending each player's games to temporary CSV and
+    # Parquet files as they arrive (one row group per player); they only
+    # replace the previous outputs, together, once the run succeeds
+    tmp_csv = OUTPUT_CSV + '.tmp'
+    tmp_parquet = OUTPUT_PARQUET + '.tmp'
 
-    if not all_games:
-        logger.warning('No games collected.')
-        return
-
-    # Convert to DataFrame and save
-    df = pd.DataFrame(all_games)
-    df.to_csv(OUTPUT_CSV, index=False)
-    logger.info('Saved %d game entries to %s', len(df), OUTPUT_CSV)
-
-    # Print sample
-    logger.info('Sample of data:\n%s', df.head(10))
+    try:
+        with open(tmp_csv, 'w', newline='') as f, \
+                pq.ParquetWriter(tmp_parquet, OUTPUT_SCHEMA, compression='zstd') as parquet:
+            writer = csv.DictWriter(f, fieldnames=OUTPUT_COLUMNS, lineterminator='\n')
+            writer.writeheader()
+
+            def write_games(games):
+                writer.writerows(games)
+                if games:
+                    parquet.write_table(pa.Table.from_pylist(games, schema=OUTPUT_SCHEMA))
+
+            total = asyncio.run(scrape_all_starting_rb_gamelogs(write_games))
+
+        if not total:
+            logger.warning('No games collected; leaving %s and %s unchanged.', OUTPUT_CSV, OUTPUT_PARQUET)
+            return
+
+        os.replace(tmp_csv, OUTPUT_CSV)
+        os.replace(tmp_parquet, OUTPUT_PARQUET)
+    finally:
+        for path in (tmp_csv, tmp_parquet):
+            if os.path.exists(path):
+                os.remove(path)
+
+    logger.info('Saved %d game entries to %s and %s', total, OUTPUT_CSV, OUTPUT_PARQUET)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,147 @@
+"""
+team_rb_snapshot.py
+
+Scrapes each NFL team's ESPN roster page and depth chart together and saves
+one snapshot of its running backs to `data/team_rb_snapshot.parquet`.
+
+Columns: team, player_name, player_id, depth_rank
+ - depth_rank 'RB'  : every RB listed on the roster page
+ - depth_rank 'RB1' : the starter from the depth chart
+
+Both pages for every team are fetched in one concurrent batch (64 requests)
+over a single session, cache and parse pool (see `scrape_utils.py`). The page
+parsers live in `RB_gamelog.py` (roster) and `starting_rbs.py` (depth chart);
+those scripts are now thin wrappers that write their usual CSV/Parquet outputs
+from the snapshot (see `load_or_scrape`), re-scraping only when the saved
+snapshot is missing or older than `SNAPSHOT_MAX_AGE`.
+
+Usage:
+    pip install requests requests-cache aiohttp "aiohttp-client-cache[sqlite]" aiolimiter orjson selectolax pyarrow
+    python team_rb_snapshot.py
+"""
+
+import os
+import time
+import asyncio
+import logging
+from typing import Callable, Dict, List
+
+from RB_gamelog import ROSTER_URL, TEAM_ABBREVS, parse_roster_html
+from starting_rbs import DEPTH_URL, parse_depth_html
+from scrape_utils import CACHE_EXPIRE, open_scraper, rows_to_table
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s: %(message)s')
+logger = logging.getLogger(__name__)
+
+OUTPUT_DIR = 'data'
+OUTPUT_PARQUET = os.path.join(OUTPUT_DIR, 'team_rb_snapshot.parquet')
+OUTPUT_COLUMNS = ['team', 'player_name', 'player_id', 'depth_rank']
+
+# depth_rank values for roster rows and depth chart starters
+ROSTER_RANK = 'RB'
+STARTER_RANK = 'RB1'
+
+# A saved snapshot younger than this (seconds) is reused instead of re-scraping;
+# same window as the HTTP cache, so a re-scrape would return the same pages
+SNAPSHOT_MAX_AGE = CACHE_EXPIRE
+
+
+async def fetch_team(scrape: Callable, team_abbrev: str) -> List[Dict]:
+    """Fetch and parse one team's roster page and depth chart concurrently.
+
+    Returns the team's snapshot rows (see `OUTPUT_COLUMNS`). A page that fails
+    is logged and skipped; the other page's rows are still returned.
+    """
+    roster, rb1 = await asyncio.gather(
+        scrape(ROSTER_URL.format(team_abbrev=team_abbrev), parse_roster_html, team_abbrev),
+        scrape(DEPTH_URL.format(team_abbrev=team_abbrev), parse_depth_html, team_abbrev),
+        return_exceptions=True,
+    )
+
+    rows = []
+    if isinstance(roster, BaseException):
+        logger.error('Error scraping roster for %s: %s', team_abbrev, roster)
+    else:
+        logger.info('Found %d RBs for %s', len(roster), team_abbrev)
+        rows.extend(dict(row, depth_rank=ROSTER_RANK) for row in roster)
+
+    if isinstance(rb1, BaseException):
+        logger.error('Error scraping depth chart for %s: %s', team_abbrev, rb1)
+    elif rb1:
+        logger.info('Found RB1 for %s: %s (%s)', team_abbrev, rb1['player_name'], rb1['player_id'])
+        # Cross-check the starter against the roster RBs
+        if not isinstance(roster, BaseException) and rb1['player_id'] not in {r['player_id'] for r in roster}:
+            logger.warning('RB1 for %s (%s) is not listed as an RB on the roster page',
+                           team_abbrev, rb1['player_id'])
+        rows.append(rb1)
+    else:
+        logger.info('No RB1 found for %s', team_abbrev)
+
+    return rows
+
+
+async def scrape_snapshot(team_abbrevs: List[str] = None, scrape: Callable = None) -> List[Dict]:
+    """Scrape roster and depth chart pages for all teams; return snapshot rows.
+
+    - team_abbrevs: optional list to limit teams (useful for testing)
+    - scrape: optional shared scraper from `scrape_utils.open_scraper()`
+    """
+    if scrape is None:
+        async with open_scraper() as scrape:
+            return await scrape_snapshot(team_abbrevs, scrape)
+
+    team_abbrevs = team_abbrevs or TEAM_ABBREVS
+    per_team = await asyncio.gather(*(fetch_team(scrape, team) for team in team_abbrevs))
+    return [row for rows in per_team for row in rows]
+
+
+def select_rows(rows: List[Dict], depth_rank: str, columns: List[str]) -> List[Dict]:
+    """Return the snapshot rows with `depth_rank`, keeping only `columns`."""
+    return [{col: row[col] for col in columns} for row in rows if row['depth_rank'] == depth_rank]
+
+
+def save_snapshot(rows: List[Dict], path: str = OUTPUT_PARQUET) -> None:
+    """Write snapshot rows to Parquet."""
+    import pyarrow.parquet as pq
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    pq.write_table(rows_to_table(rows, OUTPUT_COLUMNS), path, compression='snappy')
+
+
+def read_snapshot(depth_rank: str, columns: List[str], path: str = OUTPUT_PARQUET) -> List[Dict]:
+    """Read the snapshot rows with `depth_rank` from Parquet, keeping only `columns`."""
+    import pyarrow.parquet as pq
+
+    table = pq.read_table(path, filters=[('depth_rank', '=', depth_rank)])
+    return table.select(columns).to_pylist()
+
+
+async def load_or_scrape(depth_rank: str, columns: List[str]) -> List[Dict]:
+    """Return the snapshot rows with `depth_rank`, keeping only `columns`.
+
+    Reads the saved snapshot if it is younger than `SNAPSHOT_MAX_AGE`;
+    otherwise runs the full scrape (which saves a new snapshot) and selects
+    from the returned rows.
+    """
+    if os.path.exists(OUTPUT_PARQUET) and time.time() - os.path.getmtime(OUTPUT_PARQUET) < SNAPSHOT_MAX_AGE:
+        logger.info('Using saved snapshot %s', OUTPUT_PARQUET)
+        return read_snapshot(depth_rank, columns)
+    return select_rows(await main_async(), depth_rank, columns)
+
+
+async def main_async() -> List[Dict]:
+    """Main entry point. Returns the scraped rows (empty if nothing was saved)."""
+    # WARNING: This makes two requests to ESPN for each team. Use responsibly.
+    logger.info('Starting RB snapshot scrape for %d teams', len(TEAM_ABBREVS))
+
+    rows = await scrape_snapshot()
+    if not rows:
+        logger.warning('No RBs found; snapshot not written')
+    else:
+        save_snapshot(rows)
+        logger.info('Saved %d snapshot rows to %s', len(rows), OUTPUT_PARQUET)
+    return rows
+
+
+if __name__ == '__main__':
+    asyncio.run(main_async())